@@ -4,13 +4,40 @@ Demonstra como usar STORAGE_ENDPOINT de forma agnóstica de cloud provider
 """
 import os
 import logging
-from flask import Flask, request, jsonify
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from functools import cache
+from collections import OrderedDict, namedtuple
+import orjson
+from flask import Flask, Response, redirect, request, jsonify, stream_with_context
+from flask.json.provider import JSONProvider
+from werkzeug.http import parse_range_header, unquote_etag
 
-# Setup logging
-logging.basicConfig(level=logging.INFO)
+# Setup logging: root em WARNING silencia o log por request dos SDKs (ex.: o
+# HttpLoggingPolicy do Azure loga headers em INFO); o logger da app fica em INFO
+# para manter as linhas de startup
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'WARNING').upper())
 logger = logging.getLogger(__name__)
+logger.setLevel(os.getenv('APP_LOG_LEVEL', 'INFO').upper())
+
+
+class OrjsonProvider(JSONProvider):
+    """JSON do Flask (jsonify, request.json) via orjson"""
+    
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj), mimetype='application/json')
+
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # ============================================================================
 # STORAGE CONFIGURATION
@@ -22,30 +49,109 @@ STORAGE_NAME = os.getenv('STORAGE_NAME')
 STORAGE_REGION = os.getenv('STORAGE_REGION')  # AWS only
 STORAGE_ACCESS_KEY = os.getenv('STORAGE_ACCESS_KEY')  # Azure only
 
-# Detecta cloud provider automaticamente
-IS_AWS = STORAGE_ENDPOINT and 's3' in STORAGE_ENDPOINT
-IS_AZURE = STORAGE_ENDPOINT and 'blob' in STORAGE_ENDPOINT
+# Tamanho do pool de conexões HTTP (compartilhado entre requests)
+S3_POOL_SIZE = int(os.getenv('S3_POOL_SIZE', max(32, 4 * (os.cpu_count() or 1))))  # AWS only
+AZURE_POOL_SIZE = int(os.getenv('AZURE_POOL_SIZE', '64'))  # Azure only
+
+# Threads por transferência (upload/download em chunks paralelos)
+S3_PARALLEL = int(os.getenv('S3_PARALLEL', '8'))  # AWS only
+AZURE_PARALLEL = int(os.getenv('AZURE_PARALLEL', '8'))  # Azure only
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Tamanho máximo aceito em /upload (acima disso: 413 sem ler o corpo)
+MAX_UPLOAD_MB = int(os.getenv('MAX_UPLOAD_MB', '512'))
+
+# Validade das URLs pré-assinadas (S3 presigned / Azure SAS), em segundos
+PRESIGNED_URL_TTL = int(os.getenv('PRESIGNED_URL_TTL', '300'))
 
-logger.info(f"Storage Endpoint: {STORAGE_ENDPOINT}")
-logger.info(f"Storage Name: {STORAGE_NAME}")
-logger.info(f"Cloud Provider: {'AWS' if IS_AWS else 'Azure' if IS_AZURE else 'Unknown'}")
+# Cache em memória (por worker) para downloads pequenos; 0 desabilita
+DOWNLOAD_CACHE_MB = int(os.getenv('DOWNLOAD_CACHE_MB', '64'))
+DOWNLOAD_CACHE_MAX_OBJECT = 4 * 1024 * 1024
+
+# Detecta cloud provider automaticamente (uma única vez, no startup).
+# Azure é testado primeiro: '.blob.' é mais específico que 's3', evitando que
+# um endpoint com as duas strings caia silenciosamente em AWS.
+if STORAGE_ENDPOINT and '.blob.' in STORAGE_ENDPOINT:
+    PROVIDER = 'azure'
+elif STORAGE_ENDPOINT and 's3' in STORAGE_ENDPOINT:
+    PROVIDER = 'aws'
+else:
+    PROVIDER = None
+
+logger.info("Storage Endpoint: %s", STORAGE_ENDPOINT)
+logger.info("Storage Name: %s", STORAGE_NAME)
+logger.info("Cloud Provider: %s", 'AWS' if PROVIDER == 'aws' else 'Azure' if PROVIDER == 'azure' else 'Unknown')
 
 
 # ============================================================================
 # STORAGE CLIENT - Abstração agnóstica de cloud
 # ============================================================================
 
+# chunks: iterador de bytes | size: bytes no corpo | total: tamanho do objeto
+# close: libera a conexão do corpo (chamado quando a resposta HTTP é fechada)
+DownloadResult = namedtuple(
+    'DownloadResult',
+    ['chunks', 'size', 'total', 'etag', 'close'],
+    defaults=[None]
+)
+
+
+class NotModified(Exception):
+    """Objeto não mudou desde o ETag informado pelo cliente (HTTP 304)"""
+
+
+class RangeNotSatisfiable(Exception):
+    """Byte-range fora do objeto (HTTP 416); total é o tamanho do objeto, se conhecido"""
+    
+    def __init__(self, file_name, total=None):
+        super().__init__(file_name)
+        self.total = total
+
+
 class StorageClient:
-    """Cliente abstrato para storage - funciona com AWS S3 ou Azure Blob"""
+    """Cliente abstrato para storage - funciona com AWS S3 ou Azure Blob
+    
+    O provider é resolvido uma única vez no __init__: upload_file, download_file,
+    list_files, presign_* e _prewarm são ligados à implementação do provider.
+    """
     
     def __init__(self):
-        if IS_AWS:
+        if PROVIDER == 'aws':
             import boto3
-            self.client = boto3.client('s3', region_name=STORAGE_REGION)
+            from boto3.s3.transfer import TransferConfig
+            from botocore.config import Config
+            self.client = boto3.client(
+                's3',
+                region_name=STORAGE_REGION,
+                config=Config(
+                    max_pool_connections=S3_POOL_SIZE,
+                    retries={'mode': 'standard', 'max_attempts': 3},
+                    tcp_keepalive=True
+                )
+            )
+            self.transfer_config = TransferConfig(
+                multipart_threshold=8 * 1024 * 1024,
+                max_concurrency=S3_PARALLEL,
+                use_threads=True
+            )
             self.bucket = STORAGE_NAME
             self.provider = "AWS S3"
+            # Uploads simultâneos em /upload: arquivos pequenos usam uma conexão cada
+            self.max_parallel_uploads = S3_POOL_SIZE
+            self._url_prefix = f"s3://{self.bucket}/"
+            
+            self.upload_file = self._upload_s3
+            self.download_file = self._download_s3
+            self.list_files = self._list_s3
+            self.presign_download = self._presign_download_s3
+            self.presign_upload = self._presign_upload_s3
+            self._prewarm = self._prewarm_s3
         
-        elif IS_AZURE:
+        elif PROVIDER == 'azure':
+            import requests
+            from requests.adapters import HTTPAdapter
+            from azure.core.pipeline.transport import RequestsTransport
             from azure.storage.blob import BlobServiceClient
             connection_string = (
                 f"DefaultEndpointsProtocol=https;"
@@ -53,91 +159,259 @@ class StorageClient:
                 f"AccountKey={STORAGE_ACCESS_KEY};"
                 f"EndpointSuffix=core.windows.net"
             )
-            self.client = BlobServiceClient.from_connection_string(connection_string)
+            # Session compartilhada: reaproveita conexões TLS entre requests
+            self.session = requests.Session()
+            self.session.mount('https://', HTTPAdapter(
+                pool_connections=8,
+                pool_maxsize=AZURE_POOL_SIZE
+            ))
+            self.transport = RequestsTransport(session=self.session, session_owner=False)
+            self.client = BlobServiceClient.from_connection_string(
+                connection_string,
+                transport=self.transport,
+                max_single_put_size=8 * 1024 * 1024
+            )
             self.container_name = "media-files"
             self._ensure_container()
+            self.container_client = self.client.get_container_client(self.container_name)
             self.provider = "Azure Blob Storage"
+            # Uploads simultâneos em /upload: arquivos pequenos usam uma conexão cada
+            self.max_parallel_uploads = AZURE_POOL_SIZE
+            self._url_prefix = f"https://{STORAGE_NAME}.blob.core.windows.net/{self.container_name}/"
+            
+            self.upload_file = self._upload_azure
+            self.download_file = self._download_azure
+            self.list_files = self._list_azure
+            self.presign_download = self._presign_download_azure
+            self.presign_upload = self._presign_upload_azure
+            self._prewarm = self._prewarm_azure
         
         else:
             raise ValueError("No storage configured! Check STORAGE_ENDPOINT env var")
+
     
     def _ensure_container(self):
         """Cria container Azure se não existir"""
-        if IS_AZURE:
-            try:
-                self.client.create_container(self.container_name)
-                logger.info(f"Created container: {self.container_name}")
-            except Exception as e:
-                logger.debug(f"Container already exists: {e}")
-    
-    def upload_file(self, file_name, content):
-        """Upload file - funciona para AWS e Azure"""
-        if IS_AWS:
-            self.client.put_object(
-                Bucket=self.bucket,
-                Key=file_name,
-                Body=content
-            )
-            logger.info(f"Uploaded to S3: {file_name}")
-            return f"s3://{self.bucket}/{file_name}"
+        try:
+            self.client.create_container(self.container_name)
+            logger.info("Created container: %s", self.container_name)
+        except Exception as e:
+            logger.debug("Container already exists: %s", e)
+    
+    # ------------------------------------------------------------------------
+    # AWS S3
+    # ------------------------------------------------------------------------
+    
+    def _prewarm_s3(self):
+        """HEAD no bucket: abre a conexão TLS e resolve credenciais antes do 1º request"""
+        try:
+            self.client.head_bucket(Bucket=self.bucket)
+        except Exception as e:
+            logger.warning("Storage prewarm failed: %s", e)
+    
+    def _upload_s3(self, file_name, stream, length=None):
+        """Upload file (file-like, enviado em chunks) para S3"""
+        self.client.upload_fileobj(
+            stream,
+            self.bucket,
+            file_name,
+            Config=self.transfer_config
+        )
+        logger.debug("Uploaded to S3: %s", file_name)
+        return self._url_prefix + file_name
+    
+    def _download_s3(self, file_name, offset=None, length=None, if_none_match=None):
+        """Download file em chunks do S3 (opcionalmente só um byte-range)
         
-        elif IS_AZURE:
-            blob_client = self.client.get_blob_client(
-                container=self.container_name,
-                blob=file_name
-            )
-            blob_client.upload_blob(content, overwrite=True)
-            logger.info(f"Uploaded to Azure: {file_name}")
-            return f"https://{STORAGE_NAME}.blob.core.windows.net/{self.container_name}/{file_name}"
-    
-    def download_file(self, file_name):
-        """Download file - funciona para AWS e Azure"""
-        if IS_AWS:
-            response = self.client.get_object(Bucket=self.bucket, Key=file_name)
-            content = response['Body'].read()
-            logger.info(f"Downloaded from S3: {file_name}")
-            return content
+        if_none_match é repassado ao storage; se o ETag bater, levanta NotModified
+        sem transferir o corpo.
+        """
+        from botocore.exceptions import ClientError
+        params = {'Bucket': self.bucket, 'Key': file_name}
+        if offset is not None:
+            end = offset + length - 1 if length is not None else ''
+            params['Range'] = f"bytes={offset}-{end}"
+        if if_none_match:
+            params['IfNoneMatch'] = if_none_match
+        try:
+            response = self.client.get_object(**params)
+        except ClientError as e:
+            status = e.response['ResponseMetadata'].get('HTTPStatusCode')
+            if status == 304:
+                raise NotModified(file_name) from e
+            if status == 416:
+                total = e.response['Error'].get('ActualObjectSize')
+                raise RangeNotSatisfiable(file_name, int(total) if total else None) from e
+            raise
+        logger.debug("Downloading from S3: %s", file_name)
+        size = response['ContentLength']
+        total = (
+            int(response['ContentRange'].rsplit('/', 1)[1])
+            if 'ContentRange' in response else size
+        )
+        body = response['Body']
+        return DownloadResult(
+            body.iter_chunks(chunk_size=DOWNLOAD_CHUNK_SIZE),
+            size,
+            total,
+            response['ETag'],
+            body.close
+        )
+    
+    def _list_s3(self):
+        """Lista arquivos do S3 paginando - gera os nomes sob demanda"""
+        paginator = self.client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(
+            Bucket=self.bucket,
+            PaginationConfig={'PageSize': 1000}
+        )
+        for page in pages:
+            for obj in page.get('Contents', []):
+                yield obj['Key']
+        logger.debug("Listed files from S3")
+    
+    def _presign_download_s3(self, file_name):
+        """URL pré-assinada para GET direto no S3"""
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': file_name},
+            ExpiresIn=PRESIGNED_URL_TTL
+        )
+    
+    def _presign_upload_s3(self, file_name):
+        """URL pré-assinada para PUT direto no S3 - retorna (url, headers exigidos)"""
+        url = self.client.generate_presigned_url(
+            'put_object',
+            Params={'Bucket': self.bucket, 'Key': file_name},
+            ExpiresIn=PRESIGNED_URL_TTL
+        )
+        return url, {}
+    
+    # ------------------------------------------------------------------------
+    # Azure Blob Storage
+    # ------------------------------------------------------------------------
+    
+    def _prewarm_azure(self):
+        """Lê as propriedades do container: abre a conexão TLS antes do 1º request"""
+        try:
+            self.container_client.get_container_properties()
+        except Exception as e:
+            logger.warning("Storage prewarm failed: %s", e)
+    
+    def _upload_azure(self, file_name, stream, length=None):
+        """Upload file (file-like, enviado em chunks) para Azure"""
+        blob_client = self.container_client.get_blob_client(file_name)
+        blob_client.upload_blob(
+            stream,
+            overwrite=True,
+            max_concurrency=AZURE_PARALLEL,
+            length=length
+        )
+        logger.debug("Uploaded to Azure: %s", file_name)
+        return self._url_prefix + file_name
+    
+    def _download_azure(self, file_name, offset=None, length=None, if_none_match=None):
+        """Download file em chunks do Azure (opcionalmente só um byte-range)
         
-        elif IS_AZURE:
-            blob_client = self.client.get_blob_client(
-                container=self.container_name,
-                blob=file_name
+        if_none_match é repassado ao storage; se o ETag bater, levanta NotModified
+        sem transferir o corpo.
+        """
+        from azure.core import MatchConditions
+        from azure.core.exceptions import HttpResponseError
+        blob_client = self.container_client.get_blob_client(file_name)
+        conditions = {}
+        if if_none_match:
+            conditions = {'etag': if_none_match, 'match_condition': MatchConditions.IfModified}
+        try:
+            downloader = blob_client.download_blob(
+                offset=offset,
+                length=length,
+                max_concurrency=AZURE_PARALLEL,
+                **conditions
             )
-            content = blob_client.download_blob().readall()
-            logger.info(f"Downloaded from Azure: {file_name}")
-            return content
-    
-    def list_files(self):
-        """Lista arquivos - funciona para AWS e Azure"""
-        if IS_AWS:
-            response = self.client.list_objects_v2(Bucket=self.bucket)
-            files = [obj['Key'] for obj in response.get('Contents', [])]
-            logger.info(f"Listed {len(files)} files from S3")
-            return files
-        
-        elif IS_AZURE:
-            container_client = self.client.get_container_client(self.container_name)
-            files = [blob.name for blob in container_client.list_blobs()]
-            logger.info(f"Listed {len(files)} files from Azure")
-            return files
+        except HttpResponseError as e:
+            # O SDK reempacota o 304 (ResourceNotModifiedError) em HttpResponseError
+            if e.status_code == 304:
+                raise NotModified(file_name) from e
+            if e.status_code == 416:
+                content_range = e.response.headers.get('Content-Range') if e.response else None
+                total = content_range.rsplit('/', 1)[1] if content_range else None
+                raise RangeNotSatisfiable(
+                    file_name,
+                    int(total) if total and total.isdigit() else None
+                ) from e
+            raise
+        logger.debug("Downloading from Azure: %s", file_name)
+        # properties.size é sobrescrito com o tamanho do range; o total do blob
+        # vem do Content-Range. downloader.size pode passar do fim do blob.
+        content_range = downloader.properties.content_range
+        total = int(content_range.rsplit('/', 1)[1]) if content_range else downloader.size
+        return DownloadResult(
+            downloader.chunks(),
+            min(downloader.size, total - (offset or 0)),
+            total,
+            downloader.properties.etag
+        )
+    
+    def _list_azure(self):
+        """Lista arquivos do Azure paginando - gera os nomes sob demanda"""
+        pages = self.container_client.list_blobs(results_per_page=5000).by_page()
+        for page in pages:
+            for blob in page:
+                yield blob.name
+        logger.debug("Listed files from Azure")
+    
+    def _sas_url(self, file_name, permission):
+        """URL do blob com SAS token assinado pela account key"""
+        from azure.storage.blob import generate_blob_sas
+        sas = generate_blob_sas(
+            account_name=STORAGE_NAME,
+            container_name=self.container_name,
+            blob_name=file_name,
+            account_key=STORAGE_ACCESS_KEY,
+            permission=permission,
+            expiry=datetime.now(timezone.utc) + timedelta(seconds=PRESIGNED_URL_TTL)
+        )
+        return f"{self.container_client.get_blob_client(file_name).url}?{sas}"
+    
+    def _presign_download_azure(self, file_name):
+        """URL com SAS de leitura para GET direto no Azure"""
+        from azure.storage.blob import BlobSasPermissions
+        return self._sas_url(file_name, BlobSasPermissions(read=True))
+    
+    def _presign_upload_azure(self, file_name):
+        """URL com SAS de escrita para PUT direto no Azure - retorna (url, headers exigidos)"""
+        from azure.storage.blob import BlobSasPermissions
+        url = self._sas_url(file_name, BlobSasPermissions(create=True, write=True))
+        return url, {'x-ms-blob-type': 'BlockBlob'}
 
 
-# Inicializa cliente de storage
-try:
-    storage = StorageClient()
-except Exception as e:
-    logger.error(f"Failed to initialize storage: {e}")
-    storage = None
+# Cliente de storage criado sob demanda: o import do SDK e a resolução de
+# credenciais acontecem no primeiro request de cada worker, não no import
+_storage = None
+_storage_initialized = False
+_storage_lock = threading.Lock()
 
 
-# ============================================================================
-# API ENDPOINTS
-# ============================================================================
+def get_storage():
+    """Retorna o StorageClient do processo, criando-o no primeiro uso (thread-safe)"""
+    global _storage, _storage_initialized
+    if not _storage_initialized:
+        with _storage_lock:
+            if not _storage_initialized:
+                try:
+                    _storage = StorageClient()
+                except Exception as e:
+                    logger.error("Failed to initialize storage: %s", e)
+                _storage_initialized = True
+    return _storage
 
-@app.route('/health')
-def health():
-    """Health check"""
-    return jsonify({
+
+# Respostas de /health e /info não mudam depois do startup: serializa uma vez
+@cache
+def _health_body():
+    storage = get_storage()
+    return orjson.dumps({
         "status": "healthy",
         "storage": {
             "configured": storage is not None,
@@ -147,9 +421,96 @@ def health():
     })
 
 
+@cache
+def _info_body():
+    storage = get_storage()
+    return orjson.dumps({
+        "app": "media-service",
+        "version": os.getenv('APP_VERSION', '1.0.0'),
+        "environment": os.getenv('APP_ENV', 'development'),
+        "storage": {
+            "provider": storage.provider if storage else None,
+            "endpoint": STORAGE_ENDPOINT,
+            "name": STORAGE_NAME,
+            "region": STORAGE_REGION if PROVIDER == 'aws' else None
+        },
+        "platform": {
+            "provisioned_by": "hcp-terraform-operator",
+            "managed_by": "argocd",
+            "abstraction_level": "flavor-based"
+        }
+    })
+
+
+# ============================================================================
+# DOWNLOAD CACHE - LRU em memória para arquivos pequenos, revalidado por ETag
+# ============================================================================
+
+CachedObject = namedtuple('CachedObject', ['etag', 'body'])
+
+
+class DownloadCache:
+    """LRU thread-safe limitado pelo total de bytes armazenados"""
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+    
+    def pop(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+    
+    def put(self, key, etag, body):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.body)
+            self._entries[key] = CachedObject(etag, body)
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted.body)
+
+
+_download_cache = DownloadCache(DOWNLOAD_CACHE_MB * 1024 * 1024) if DOWNLOAD_CACHE_MB > 0 else None
+
+
+# ============================================================================
+# API ENDPOINTS
+# ============================================================================
+
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_MB * 1024 * 1024
+
+
+@app.errorhandler(413)
+def request_too_large(e):
+    """Upload acima de MAX_UPLOAD_MB"""
+    return jsonify({"error": f"File too large (max {MAX_UPLOAD_MB} MB)"}), 413
+
+
+@app.route('/health')
+def health():
+    """Health check"""
+    return Response(_health_body(), mimetype='application/json')
+
+
 @app.route('/ready')
 def ready():
     """Readiness check"""
+    storage = get_storage()
     if not storage:
         return jsonify({"status": "not ready", "reason": "storage not configured"}), 503
     
@@ -159,19 +520,31 @@ def ready():
 @app.route('/upload', methods=['POST'])
 def upload():
     """Upload arquivo para storage"""
+    # Rejeita pelo Content-Length antes de ler qualquer byte do corpo
+    if request.content_length and request.content_length > app.config['MAX_CONTENT_LENGTH']:
+        return request_too_large(None)
+    
+    storage = get_storage()
     if not storage:
         return jsonify({"error": "Storage not configured"}), 503
     
-    if 'file' not in request.files:
+    files = request.files.getlist('file')
+    if not files:
         return jsonify({"error": "No file provided"}), 400
     
-    file = request.files['file']
+    if len(files) > 1:
+        return _upload_many(storage, files)
+    
+    file = files[0]
     if file.filename == '':
         return jsonify({"error": "Empty filename"}), 400
     
     try:
-        content = file.read()
-        url = storage.upload_file(file.filename, content)
+        url = storage.upload_file(
+            file.filename,
+            file.stream,
+            length=file.content_length or None
+        )
         
         return jsonify({
             "success": True,
@@ -181,72 +554,223 @@ def upload():
         })
     
     except Exception as e:
-        logger.error(f"Upload failed: {e}")
+        logger.error("Upload failed: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
-@app.route('/files')
-def list_files():
-    """Lista arquivos no storage"""
+def _upload_many(storage, files):
+    """Envia vários arquivos em paralelo; falhas são reportadas por arquivo (207)"""
+    def upload_one(file):
+        if file.filename == '':
+            return {"success": False, "filename": file.filename, "error": "Empty filename"}
+        try:
+            url = storage.upload_file(
+                file.filename,
+                file.stream,
+                length=file.content_length or None
+            )
+            return {"success": True, "filename": file.filename, "url": url}
+        except Exception as e:
+            logger.error("Upload failed for %s: %s", file.filename, e)
+            return {"success": False, "filename": file.filename, "error": str(e)}
+    
+    with ThreadPoolExecutor(max_workers=min(len(files), storage.max_parallel_uploads)) as executor:
+        results = list(executor.map(upload_one, files))
+    
+    all_ok = all(r["success"] for r in results)
+    return jsonify({
+        "success": all_ok,
+        "files": results,
+        "provider": storage.provider
+    }), 200 if all_ok else 207
+
+
+@app.route('/upload-url/<filename>')
+def upload_url(filename):
+    """URL pré-assinada para o cliente fazer PUT direto no storage"""
+    storage = get_storage()
     if not storage:
         return jsonify({"error": "Storage not configured"}), 503
     
     try:
-        files = storage.list_files()
+        url, headers = storage.presign_upload(filename)
         return jsonify({
-            "files": files,
-            "count": len(files),
+            "filename": filename,
+            "url": url,
+            "method": "PUT",
+            "headers": headers,
+            "expires_in": PRESIGNED_URL_TTL,
             "provider": storage.provider
         })
     
     except Exception as e:
-        logger.error(f"List failed: {e}")
+        logger.error("Presign failed: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+@app.route('/files')
+def list_files():
+    """Lista arquivos no storage"""
+    storage = get_storage()
+    if not storage:
+        return jsonify({"error": "Storage not configured"}), 503
+    
+    files = storage.list_files()
+    try:
+        # Busca a primeira página antes de responder para que erros de storage
+        # ainda virem 500 (depois do primeiro byte o status já foi enviado)
+        first = next(files, None)
+    except Exception as e:
+        logger.error("List failed: %s", e)
+        return jsonify({"error": str(e)}), 500
+    
+    def generate():
+        yield b'{"files": ['
+        count = 0
+        if first is not None:
+            yield orjson.dumps(first)
+            count = 1
+            for name in files:
+                yield b',' + orjson.dumps(name)
+                count += 1
+        yield b'], "count": %d, "provider": %b}' % (count, orjson.dumps(storage.provider))
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
+
+
 @app.route('/download/<filename>')
 def download(filename):
-    """Download arquivo do storage"""
+    """Download arquivo do storage (suporta header Range com um único intervalo)
+    
+    Com ?redirect=1 responde 302 para uma URL pré-assinada e o cliente baixa
+    direto do storage, sem passar os bytes pelo worker.
+    """
+    storage = get_storage()
     if not storage:
         return jsonify({"error": "Storage not configured"}), 503
     
+    if request.args.get('redirect') in ('1', 'true'):
+        try:
+            return redirect(storage.presign_download(filename), 302)
+        except Exception as e:
+            logger.error("Presign failed: %s", e)
+            return jsonify({"error": str(e)}), 500
+    
+    offset, length = _parse_byte_range(request.headers.get('Range'))
+    if_none_match = request.headers.get('If-None-Match')
+    
+    # Range requests não usam o cache; os demais revalidam a entrada pelo ETag
+    cached = _download_cache.get(filename) if _download_cache and offset is None else None
+    
     try:
-        content = storage.download_file(filename)
-        return content, 200, {
+        try:
+            result = storage.download_file(
+                filename,
+                offset=offset,
+                length=length,
+                if_none_match=cached.etag if cached else if_none_match
+            )
+        except NotModified:
+            if cached is None or request.if_none_match.contains_weak(unquote_etag(cached.etag)[0]):
+                raise
+            # Entrada do cache continua válida, mas o cliente não tem essa versão
+            result = DownloadResult(iter([cached.body]), len(cached.body), len(cached.body), cached.etag)
+        except Exception:
+            if cached:
+                _download_cache.pop(filename)
+            raise
+        else:
+            if _download_cache and offset is None and result.size <= DOWNLOAD_CACHE_MAX_OBJECT:
+                try:
+                    body = b''.join(result.chunks)
+                except Exception:
+                    # Falha no meio da leitura: a resposta nunca será criada,
+                    # então fecha o corpo aqui para devolver a conexão ao pool
+                    if result.close:
+                        result.close()
+                    raise
+                _download_cache.put(filename, result.etag, body)
+                result = result._replace(chunks=iter([body]))
+            elif cached:
+                # Nova versão não cabe no cache: descarta a entrada antiga
+                _download_cache.pop(filename)
+            
+            # A entrada do cache estava velha, então o storage foi consultado com
+            # o ETag dela; o cliente ainda pode já ter a versão atual
+            if cached and request.if_none_match.contains_weak(unquote_etag(result.etag)[0]):
+                if result.close:
+                    result.close()
+                return '', 304, {'Cache-Control': 'no-cache', 'ETag': result.etag}
+        
+        headers = {
             'Content-Type': 'application/octet-stream',
-            'Content-Disposition': f'attachment; filename={filename}'
+            'Content-Disposition': f'attachment; filename={filename}',
+            'Content-Length': str(result.size),
+            'Accept-Ranges': 'bytes',
+            'ETag': result.etag,
+            'Cache-Control': 'no-cache'
         }
+        status = 200
+        if offset is not None:
+            status = 206
+            headers['Content-Range'] = f"bytes {offset}-{offset + result.size - 1}/{result.total}"
+        
+        response = Response(stream_with_context(result.chunks), status, headers)
+        if result.close:
+            # Fecha o corpo mesmo que ele nunca seja iterado (HEAD, cliente que
+            # desconecta antes do primeiro chunk), devolvendo a conexão ao pool
+            response.call_on_close(result.close)
+        return response
+    
+    except NotModified:
+        headers = {'Cache-Control': 'no-cache'}
+        if cached:
+            headers['ETag'] = cached.etag
+        elif len(request.if_none_match) == 1:
+            headers['ETag'] = if_none_match
+        return '', 304, headers
+    
+    except RangeNotSatisfiable as e:
+        headers = {'Accept-Ranges': 'bytes'}
+        if e.total is not None:
+            headers['Content-Range'] = f"bytes */{e.total}"
+        return jsonify({"error": "Requested range not satisfiable"}), 416, headers
     
     except Exception as e:
-        logger.error(f"Download failed: {e}")
+        logger.error("Download failed: %s", e)
         return jsonify({"error": str(e)}), 500
 
 
+def _parse_byte_range(header):
+    """Converte header Range em (offset, length); ignora ranges não suportados"""
+    byte_range = parse_range_header(header)
+    if not byte_range or len(byte_range.ranges) != 1:
+        return None, None
+    
+    start, stop = byte_range.ranges[0]
+    if start < 0:
+        # Suffix range (bytes=-N) exige o tamanho total; serve o objeto inteiro
+        return None, None
+    
+    return start, (stop - start if stop is not None else None)
+
+
 @app.route('/info')
 def info():
     """Informações sobre a configuração"""
-    return jsonify({
-        "app": "media-service",
-        "version": os.getenv('APP_VERSION', '1.0.0'),
-        "environment": os.getenv('APP_ENV', 'development'),
-        "storage": {
-            "provider": storage.provider if storage else None,
-            "endpoint": STORAGE_ENDPOINT,
-            "name": STORAGE_NAME,
-            "region": STORAGE_REGION if IS_AWS else None
-        },
-        "platform": {
-            "provisioned_by": "hcp-terraform-operator",
-            "managed_by": "argocd",
-            "abstraction_level": "flavor-based"
-        }
-    })
+    return Response(
+        _info_body(),
+        mimetype='application/json',
+        headers={'Cache-Control': 'public, max-age=60'}
+    )
 
 
 # ============================================================================
 # MAIN
 # ============================================================================
 
+# Apenas para desenvolvimento local - em produção rode via Gunicorn
+# (gunicorn -c gunicorn_conf.py app:app)
 if __name__ == '__main__':
     port = int(os.getenv('PORT', 8080))
     app.run(host='0.0.0.0', port=port, debug=False)
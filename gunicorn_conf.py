@@ -0,0 +1,29 @@
+"""
+Configuração do Gunicorn para o Media Service
+Workers gthread: o trabalho é I/O bloqueante contra S3/Azure
+"""
+import os
+import threading
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+worker_class = 'gthread'
+# Default fixo e pequeno: cpu_count() enxerga as CPUs do host, não o limite do
+# container, e cada worker gthread já atende GUNICORN_THREADS requests
+workers = int(os.getenv('GUNICORN_WORKERS', '2'))
+threads = int(os.getenv('GUNICORN_THREADS', '32'))
+
+
+def post_worker_init(worker):
+    """Cria o StorageClient e aquece o pool de conexões em background
+    
+    Roda fora do boot do worker: com o storage inacessível, os timeouts/retries
+    do SDK passariam do timeout do Gunicorn e o worker seria morto em loop.
+    """
+    from app import get_storage
+    
+    def prewarm():
+        storage = get_storage()
+        if storage:
+            storage._prewarm()
+    
+    threading.Thread(target=prewarm, name='storage-prewarm', daemon=True).start()